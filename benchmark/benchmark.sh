@@ -12,6 +12,8 @@ duration=${3:-60}
 prompt_lines=${4:-18}
 # Output tokens
 tokens=${5:-250}
+# Local port to serve live metrics on (0 to disable)
+metrics_port=${METRICS_PORT:-0}
 
 suffix=$(date +%Y%m%d%H%M%S)-${users}-users-${duration}-s
 
@@ -25,7 +27,9 @@ locust --headless  \
        --spawn-rate 10 \
        --prompt-file ${SCRIPT_DIR}/alice.txt \
        --average-prompt-lines ${prompt_lines} \
-       --average-output-tokens ${tokens}
+       --average-output-tokens ${tokens} \
+       --metrics-port ${metrics_port} \
+       --metrics-snapshot-file ${endpoint}-${suffix}_metrics.jsonl
 python ${SCRIPT_DIR}/benchmark_summary.py \
        --prefix ${endpoint}- \
        --summary_file ${endpoint}_summary.csv
@@ -1,5 +1,6 @@
 import argparse
 import csv
+import json
 from pathlib import Path
 
 METRICS_NAMES = ["encoding_time", "total_time", "decoding_time"]
@@ -38,15 +39,212 @@ def summarize(metrics: dict[str, str]):
     return prompt_tokens, generated_tokens, rps, ttft, latency, throughput
 
 
+def read_deployments(filepath: str | Path):
+    """Read the deployment metadata of the benchmarked endpoints
+
+    The file is a JSON dictionary indexed by endpoint name, as written by deploy_image.py:
+
+    {"my-endpoint": {"instance_type": "ml.inf2.xlarge", "copies": 1, "num_cores": 2, "batch_size": 4}}
+
+    Args:
+        filepath: the path to the deployments JSON file
+    Returns:
+        A dictionary of deployment metadata indexed by endpoint name
+    Raises:
+        ValueError: if a deployment does not specify its instance type
+    """
+    with open(filepath) as f:
+        deployments = json.load(f)
+    for endpoint, deployment in deployments.items():
+        if "instance_type" not in deployment:
+            raise ValueError(f"The deployment of {endpoint} in {filepath} does not specify an instance_type")
+    return deployments
+
+
+def read_prices(filepath: str | Path):
+    """Read a local table of instance hourly prices
+
+    The file is a CSV file with an "Instance type" and a "Price per hour ($)" column.
+
+    Args:
+        filepath: the path to the prices CSV file
+    Returns:
+        A dictionary of hourly prices indexed by instance type
+    """
+    with open(filepath, newline='') as csvfile:
+        prices_reader = csv.DictReader(csvfile, delimiter=',')
+        return {row["Instance type"]: float(row["Price per hour ($)"]) for row in prices_reader}
+
+
+def find_deployment(run_name: str, deployments: dict[str, dict]):
+    """Find the endpoint deployment a run belongs to
+
+    Args:
+        run_name: the benchmark run name, prefixed by the endpoint name
+        deployments: the deployment metadata indexed by endpoint name
+    Returns:
+        A tuple of endpoint name, deployment metadata, or (None, None) if no deployment matches
+    """
+    # Prefer the longest endpoint name in case some endpoint names are prefixes of others
+    for endpoint in sorted(deployments, key=len, reverse=True):
+        if run_name.startswith(f"{endpoint}-"):
+            return endpoint, deployments[endpoint]
+    return None, None
+
+
+def cost_per_million_tokens(hourly_price: float, throughput: float):
+    """Evaluate the cost of one million tokens
+
+    Args:
+        hourly_price: the instance price per hour in $
+        throughput: the tokens throughput in tokens per second
+    Returns:
+        The price in $ of one million tokens, or None if the throughput is null
+    """
+    if throughput <= 0:
+        return None
+    return hourly_price / (throughput * 3600) * 1e6
+
+
+def summarize_costs(runs: list[dict],
+                    deployments: dict[str, dict],
+                    ttft_slo: float | None = None,
+                    itl_slo: float | None = None):
+    """Summarize the cost-efficiency of each deployment configuration
+
+    For each configuration, the SLO-constrained throughput is the highest throughput among the
+    runs that satisfy the time-to-first-token and inter-token-latency SLOs.
+    The configurations are ranked by cost per million output tokens, and those that are not
+    dominated in cost, time-to-first-token and inter-token-latency by another configuration
+    are flagged as being on the cost-vs-latency frontier.
+    Configurations that cannot be ranked are listed after the ranked ones, with a status explaining why.
+
+    Args:
+        runs: the benchmark runs, each with its summary metrics and deployment metadata
+        deployments: the deployment metadata indexed by endpoint name
+        ttft_slo: the maximum time-to-first-token in seconds
+        itl_slo: the maximum inter-token-latency in milliseconds
+    Returns:
+        A list of configuration cost summaries, ranked ones first sorted by cost per million output tokens
+    """
+    endpoint_runs = {endpoint: [] for endpoint in deployments}
+    costs = []
+    unranked = []
+    for run in runs:
+        if run["endpoint"] is None:
+            unranked.append({**run, "status": "no deployment"})
+        else:
+            endpoint_runs[run["endpoint"]].append(run)
+    for endpoint, endpoint_run_list in endpoint_runs.items():
+        deployment = deployments[endpoint]
+        if len(endpoint_run_list) == 0:
+            unranked.append({"endpoint": endpoint, "deployment": deployment, "status": "not benchmarked"})
+            continue
+        if endpoint_run_list[0]["price"] is None:
+            unranked.append({"endpoint": endpoint, "deployment": deployment, "status": "no price"})
+            continue
+        best_run = None
+        for run in endpoint_run_list:
+            if ttft_slo is not None and run["ttft"] > ttft_slo:
+                continue
+            if itl_slo is not None and run["latency"] > itl_slo:
+                continue
+            if best_run is None or run["throughput"] > best_run["throughput"]:
+                best_run = run
+        if best_run is None:
+            unranked.append({"endpoint": endpoint,
+                             "deployment": deployment,
+                             "price": endpoint_run_list[0]["price"],
+                             "status": "no SLO-compliant run"})
+            continue
+        output_cost = cost_per_million_tokens(best_run["price"], best_run["throughput"])
+        total_cost = cost_per_million_tokens(best_run["price"], best_run["total_throughput"])
+        if output_cost is None:
+            unranked.append({**best_run, "status": "no throughput"})
+            continue
+        costs.append({**best_run, "output_cost": output_cost, "total_cost": total_cost, "status": "ok"})
+
+    def dominates(a, b):
+        keys = ("output_cost", "ttft", "latency")
+        return all(a[k] <= b[k] for k in keys) and any(a[k] < b[k] for k in keys)
+
+    for cost in costs:
+        cost["frontier"] = not any(dominates(other, cost) for other in costs)
+    return sorted(costs, key=lambda cost: cost["output_cost"]) + unranked
+
+
+def write_cost_summary(filepath: str | Path, costs: list[dict]):
+    with open(filepath, 'w') as cost_file:
+        cost_writer = csv.writer(cost_file, delimiter=',')
+        cost_writer.writerow([
+            "Rank",
+            "Endpoint",
+            "Instance type",
+            "Copies",
+            "Number of cores",
+            "Batch size",
+            "Best Run Name",
+            "Time-to-first-token (s)",
+            "Inter-token-latency (ms)",
+            "Output Token Throughput (t/s)",
+            "Price per hour ($)",
+            "Price per 1M output tokens ($)",
+            "Price per 1M total tokens ($)",
+            "Cost-latency frontier",
+            "Status",
+        ])
+        rank = 0
+        for cost in costs:
+            ranked = cost["status"] == "ok"
+            if ranked:
+                rank += 1
+            deployment = cost.get("deployment") or {}
+            cost_writer.writerow([
+                rank if ranked else "",
+                cost.get("endpoint", ""),
+                deployment.get("instance_type", ""),
+                deployment.get("copies", 1) if deployment else "",
+                deployment.get("num_cores", ""),
+                deployment.get("batch_size", ""),
+                cost.get("run_name", ""),
+                cost.get("ttft", ""),
+                cost.get("latency", ""),
+                cost.get("throughput", ""),
+                cost.get("price", ""),
+                cost.get("output_cost", ""),
+                cost.get("total_cost", ""),
+                cost.get("frontier", ""),
+                cost["status"],
+            ])
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("directory", nargs="*", type=str, default=".")
     parser.add_argument("--prefix", type=str, default="")
     parser.add_argument("--summary_file", type=str, default="benchmark_summary.csv")
+    parser.add_argument("--deployment_file",
+                        type=str,
+                        help="A JSON file containing the deployment metadata of the benchmarked endpoints.")
+    parser.add_argument("--price_file",
+                        type=str,
+                        help="A CSV file containing the hourly price of each instance type.")
+    parser.add_argument("--cost_file", type=str, default="benchmark_costs.csv")
+    parser.add_argument("--ttft_slo", type=float, help="The maximum time-to-first-token in seconds.")
+    parser.add_argument("--itl_slo", type=float, help="The maximum inter-token-latency in milliseconds.")
     args = parser.parse_args()
+    if (args.deployment_file is None) != (args.price_file is None):
+        raise ValueError("You must pass both a deployment file and a price file to evaluate costs")
+    if (args.ttft_slo is not None or args.itl_slo is not None) and args.deployment_file is None:
+        raise ValueError("You must pass a deployment file and a price file to evaluate costs under SLOs")
+    with_costs = args.deployment_file is not None
+    if with_costs:
+        deployments = read_deployments(args.deployment_file)
+        prices = read_prices(args.price_file)
+    runs = []
     with open(args.summary_file, 'w') as summary_file:
         summary_writer = csv.writer(summary_file, delimiter=',')
-        summary_writer.writerow([
+        labels = [
             "Run Name",
             "Average prompt tokens",
             "Average generated tokens",
@@ -54,7 +252,14 @@ if __name__ == "__main__":
             "Time-to-first-token (s)",
             "Inter-token-latency (ms)",
             "Output Token Throughput (t/s)"
-        ])
+        ]
+        if with_costs:
+            labels += [
+                "Instance type",
+                "Price per 1M output tokens ($)",
+                "Price per 1M total tokens ($)",
+            ]
+        summary_writer.writerow(labels)
         csv_stats_path = Path(args.directory)
         csv_stats_files = csv_stats_path.glob(f"{args.prefix}*.csv_stats.csv")
         for csv_stat_file in csv_stats_files:
@@ -64,4 +269,32 @@ if __name__ == "__main__":
             csv_stat_name = csv_stat_file.name.split('.')[0]
             # Extract the run name
             run_name = csv_stat_name.removeprefix(args.prefix)
-            summary_writer.writerow((run_name,) + summary)
+            if not with_costs:
+                summary_writer.writerow((run_name,) + summary)
+                continue
+            endpoint, deployment = find_deployment(csv_stat_name, deployments)
+            prompt_tokens, generated_tokens, rps, ttft, latency, throughput = summary
+            total_throughput = rps * (prompt_tokens + generated_tokens)
+            price = None
+            if deployment is None or deployment["instance_type"] not in prices:
+                print(f"No deployment or price found for {csv_stat_name}: skipping cost evaluation")
+                instance_type = "" if deployment is None else deployment["instance_type"]
+                summary_writer.writerow((run_name,) + summary + (instance_type, "", ""))
+            else:
+                price = prices[deployment["instance_type"]]
+                output_cost = cost_per_million_tokens(price, throughput)
+                total_cost = cost_per_million_tokens(price, total_throughput)
+                summary_writer.writerow((run_name,) + summary + (deployment["instance_type"], output_cost, total_cost))
+            runs.append({
+                "run_name": run_name,
+                "endpoint": endpoint,
+                "deployment": deployment,
+                "price": price,
+                "ttft": ttft,
+                "latency": latency,
+                "throughput": throughput,
+                "total_throughput": total_throughput,
+            })
+    if with_costs:
+        costs = summarize_costs(runs, deployments, ttft_slo=args.ttft_slo, itl_slo=args.itl_slo)
+        write_cost_summary(args.cost_file, costs)
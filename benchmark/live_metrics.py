@@ -0,0 +1,235 @@
+import bisect
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Default buckets in seconds, spanning fast inter-token latencies up to long end-to-end requests
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """A cumulative streaming histogram with fixed buckets, following the Prometheus semantics
+
+    Observations are only counted in their bucket, so that recording a value is a constant-time
+    operation. Cumulative counts are evaluated when the histogram is exported.
+    """
+
+    def __init__(self, name: str, help: str, buckets: tuple[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        # The extra bucket corresponds to +Inf
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self):
+        return list(self.counts), self.sum, self.count
+
+    def quantile(self, q: float, counts: list[int]):
+        """Estimate a quantile from (possibly differential) bucket counts by linear interpolation"""
+        total = sum(counts)
+        if total == 0:
+            return None
+        rank = q * total
+        cumulative = 0
+        for i, count in enumerate(counts):
+            if cumulative + count >= rank and count > 0:
+                if i == len(self.buckets):
+                    # Values beyond the last bucket can only be bounded from below
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i]
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+    def to_prometheus(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        counts, total, count = self.snapshot()
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += bucket_count
+            le = "+Inf" if bound == float("inf") else f"{bound}"
+            lines.append(f'{self.name}_bucket{{le="{le}"}} {cumulative}')
+        lines.append(f"{self.name}_sum {total}")
+        lines.append(f"{self.name}_count {count}")
+        return lines
+
+
+class LiveMetrics:
+    """Streaming metrics of the in-flight benchmark requests
+
+    The metrics can be served in the Prometheus/OpenMetrics text format on a local /metrics endpoint,
+    and periodically written as time-bucketed JSON snapshots.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.ttft = Histogram("benchmark_time_to_first_token_seconds", "Time to first token.")
+        self.itl = Histogram("benchmark_inter_token_latency_seconds", "Latency between two consecutive chunks.")
+        # Failed requests are excluded, as throttled requests fail fast and would lower the latency under load
+        self.e2e = Histogram("benchmark_end_to_end_latency_seconds", "End-to-end latency of successful requests.")
+        self.histograms = (self.ttft, self.itl, self.e2e)
+        self.active_streams = 0
+        self.tokens_in_flight = 0
+        self.requests = 0
+        self.generated_tokens = 0
+        self.errors = {}
+        self.start_time = time.time()
+        self.server = None
+        self.last_snapshot = None
+
+    def start_request(self, output_tokens: int):
+        with self.lock:
+            self.active_streams += 1
+            self.tokens_in_flight += output_tokens
+
+    # Each streamed chunk is assumed to contain one token
+    def first_token(self, ttft: float):
+        with self.lock:
+            self.ttft.observe(ttft)
+            self.tokens_in_flight -= 1
+            self.generated_tokens += 1
+
+    def next_token(self, itl: float):
+        with self.lock:
+            self.itl.observe(itl)
+            self.tokens_in_flight -= 1
+            self.generated_tokens += 1
+
+    def end_request(self,
+                    output_tokens: int,
+                    streamed_chunks: int,
+                    total_time: float,
+                    error: BaseException = None):
+        with self.lock:
+            self.active_streams -= 1
+            # Release the tokens that were requested but not streamed
+            self.tokens_in_flight -= output_tokens - streamed_chunks
+            self.requests += 1
+            if error is None:
+                self.e2e.observe(total_time)
+            else:
+                error_type = error_type_name(error)
+                self.errors[error_type] = self.errors.get(error_type, 0) + 1
+
+    def to_prometheus(self):
+        with self.lock:
+            lines = []
+            for histogram in self.histograms:
+                lines += histogram.to_prometheus()
+            lines += [
+                "# HELP benchmark_active_streams Number of streams currently open.",
+                "# TYPE benchmark_active_streams gauge",
+                f"benchmark_active_streams {self.active_streams}",
+                "# HELP benchmark_tokens_in_flight Number of output tokens still owed to the open streams.",
+                "# TYPE benchmark_tokens_in_flight gauge",
+                f"benchmark_tokens_in_flight {self.tokens_in_flight}",
+                "# HELP benchmark_requests Number of finished requests, including failed and interrupted ones.",
+                "# TYPE benchmark_requests counter",
+                f"benchmark_requests_total {self.requests}",
+                "# HELP benchmark_generated_tokens Number of streamed output tokens, assuming one token per chunk.",
+                "# TYPE benchmark_generated_tokens counter",
+                f"benchmark_generated_tokens_total {self.generated_tokens}",
+                "# HELP benchmark_errors Number of failed requests by error type.",
+                "# TYPE benchmark_errors counter",
+            ]
+            for error_type, count in sorted(self.errors.items()):
+                lines.append(f'benchmark_errors_total{{type="{error_type}"}} {count}')
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """Return the metrics observed since the previous snapshot
+
+        Returns:
+            A dictionary containing the current gauges and, for each histogram, the number of observations,
+            mean and estimated percentiles over the last time bucket.
+        """
+        now = time.time()
+        with self.lock:
+            current = {h.name: h.snapshot() for h in self.histograms}
+            gauges = {
+                "active_streams": self.active_streams,
+                "tokens_in_flight": self.tokens_in_flight,
+                "requests": self.requests,
+                "generated_tokens": self.generated_tokens,
+                "errors": dict(self.errors),
+            }
+        previous = self.last_snapshot
+        self.last_snapshot = (now, current, gauges)
+        start = self.start_time if previous is None else previous[0]
+        snapshot = {"timestamp": now, "elapsed": now - self.start_time, "interval": now - start, **gauges}
+        if previous is not None:
+            snapshot["requests"] -= previous[2]["requests"]
+            snapshot["generated_tokens"] -= previous[2]["generated_tokens"]
+            snapshot["errors"] = {
+                error_type: count - previous[2]["errors"].get(error_type, 0)
+                for error_type, count in gauges["errors"].items()
+            }
+        snapshot["output_token_throughput"] = snapshot["generated_tokens"] / max(snapshot["interval"], 1e-9)
+        for histogram in self.histograms:
+            counts, total, count = current[histogram.name]
+            if previous is not None:
+                previous_counts, previous_total, previous_count = previous[1][histogram.name]
+                counts = [c - p for c, p in zip(counts, previous_counts)]
+                total -= previous_total
+                count -= previous_count
+            snapshot[histogram.name] = {
+                "count": count,
+                "mean": total / count if count > 0 else None,
+                "p50": histogram.quantile(0.5, counts),
+                "p90": histogram.quantile(0.9, counts),
+                "p99": histogram.quantile(0.99, counts),
+            }
+        return snapshot
+
+    def write_snapshot(self, filepath: str):
+        with open(filepath, "a") as f:
+            f.write(json.dumps(self.snapshot()) + "\n")
+
+    def serve(self, port: int, host: str = "127.0.0.1"):
+        """Serve the metrics on http://<host>:<port>/metrics in a background thread"""
+        metrics = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.to_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/openmetrics-text; version=1.0.0; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # Do not pollute the benchmark output with scraping requests
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def shutdown(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+def error_type_name(error: BaseException):
+    """Return the error code of AWS client errors (like ThrottlingException), or the exception class name"""
+    response = getattr(error, "response", None)
+    if isinstance(response, dict):
+        code = response.get("Error", {}).get("Code")
+        if code:
+            return code
+    return type(error).__name__
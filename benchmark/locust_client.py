@@ -5,9 +5,11 @@ import time
 import random
 
 import boto3
+import gevent
 from locust.contrib.fasthttp import FastHttpUser
 
 from locust import task, events
+from live_metrics import LiveMetrics
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
@@ -28,12 +30,45 @@ def _(parser):
     parser.add_argument("--average-output-tokens",
                         type=int,
                         default=64, help="The average number of output tokens to generate")
+    parser.add_argument("--metrics-port",
+                        type=int,
+                        default=0, help="The local port on which live metrics are served under /metrics (0 to disable)")
+    parser.add_argument("--metrics-snapshot-file",
+                        type=str,
+                        default="", help="The JSON lines file where live metrics snapshots are written")
+    parser.add_argument("--metrics-snapshot-interval",
+                        type=float,
+                        default=10, help="The duration in seconds of each live metrics snapshot")
 
 
 @events.test_start.add_listener
 def _(environment, **kw):
     with open(environment.parsed_options.prompt_file, "r") as f:
         environment.prompt_lines = f.readlines()
+    options = environment.parsed_options
+    environment.live_metrics = LiveMetrics()
+    if options.metrics_port > 0:
+        environment.live_metrics.serve(options.metrics_port)
+        logger.info(f"Serving live metrics on http://127.0.0.1:{options.metrics_port}/metrics")
+    environment.live_metrics_greenlet = None
+    if options.metrics_snapshot_file:
+        def write_snapshots():
+            while True:
+                gevent.sleep(options.metrics_snapshot_interval)
+                environment.live_metrics.write_snapshot(options.metrics_snapshot_file)
+        environment.live_metrics_greenlet = gevent.spawn(write_snapshots)
+
+
+@events.test_stop.add_listener
+def _(environment, **kw):
+    live_metrics = getattr(environment, "live_metrics", None)
+    if live_metrics is None:
+        return
+    if environment.live_metrics_greenlet is not None:
+        environment.live_metrics_greenlet.kill()
+        # Record the last incomplete time bucket
+        live_metrics.write_snapshot(environment.parsed_options.metrics_snapshot_file)
+    live_metrics.shutdown()
 
 
 # Helper for reading lines from a stream
@@ -84,13 +119,16 @@ class JSONPayloadLineIterator:
 
 
 class BotoClient:
-    def __init__(self, endpoint_name, region_name):
+    def __init__(self, endpoint_name, region_name, live_metrics=None):
         self.sagemaker_client = boto3.client("sagemaker-runtime", region_name=region_name)
         self.endpoint_name = endpoint_name
+        self.live_metrics = live_metrics
 
     def send(self, prompt, output_tokens):
 
         start_perf_counter = time.perf_counter()
+        if self.live_metrics is not None:
+            self.live_metrics.start_request(output_tokens)
 
         messages = [
             {
@@ -116,6 +154,8 @@ class BotoClient:
 
         content = ""
         encoding_time = None
+        last_chunk_time = None
+        streamed_chunks = 0
         prompt_tokens = 0
         completion_tokens = 0
         error = None
@@ -139,9 +179,16 @@ class BotoClient:
                         # This payload contains a chunk
                         chunk = response_data["choices"][0]["delta"]["content"]
                         content += chunk
+                        chunk_time = time.perf_counter()
+                        streamed_chunks += 1
                         if encoding_time is None:
                             # If this is the first chunk we receive, update encoding time
-                            encoding_time = time.perf_counter() - start_perf_counter
+                            encoding_time = chunk_time - start_perf_counter
+                            if self.live_metrics is not None:
+                                self.live_metrics.first_token(encoding_time)
+                        elif self.live_metrics is not None:
+                            self.live_metrics.next_token(chunk_time - last_chunk_time)
+                        last_chunk_time = chunk_time
                     elif "usage" in response_data:
                         usage = response_data["usage"]
                         prompt_tokens = usage["prompt_tokens"]
@@ -149,8 +196,14 @@ class BotoClient:
         except Exception as e:
             logger.error(e)
             error = e
-
-        total_time = time.perf_counter() - start_perf_counter
+        except BaseException as e:
+            # The user is being stopped (e.g. because the run time expired): the request is interrupted
+            error = e
+            raise
+        finally:
+            total_time = time.perf_counter() - start_perf_counter
+            if self.live_metrics is not None:
+                self.live_metrics.end_request(output_tokens, streamed_chunks, total_time, error)
         events.request.fire(
             request_type="POST",
             name="total_time",
@@ -181,7 +234,9 @@ class BotoUser(FastHttpUser):
 
     def __init__(self, env):
         super().__init__(env)
-        self.client = BotoClient(self.host, self.environment.parsed_options.region)
+        self.client = BotoClient(self.host,
+                                 self.environment.parsed_options.region,
+                                 getattr(self.environment, "live_metrics", None))
 
 
 class MyUser(BotoUser):
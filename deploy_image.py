@@ -1,16 +1,33 @@
 import argparse
+import json
 import os
 import time
 import boto3
 import warnings
 from sagemaker.huggingface import HuggingFaceModel
-from typing import Dict
+from typing import Any, Dict, Optional
+
+from neuron_cache import get_cache_key, get_compile_params, lookup_compiled_artifacts, use_compiled_artifacts
+
+
+def save_deployment(filepath: str, endpoint_name: str, metadata: Dict[str, Any]):
+    """Record the deployment metadata of an endpoint in a JSON file indexed by endpoint name"""
+    deployments = {}
+    if os.path.exists(filepath):
+        with open(filepath) as f:
+            deployments = json.load(f)
+    deployments[endpoint_name] = metadata
+    with open(filepath, "w") as f:
+        json.dump(deployments, f, indent=2)
 
 
 def deploy_image(image: str,
                  config: Dict[str, str],
                  instance_type: str,
-                 iam_role: str):
+                 iam_role: str,
+                 deployment_file: Optional[str] = None,
+                 deployment_metadata: Optional[Dict[str, Any]] = None,
+                 model_data: Optional[Dict[str, Any]] = None):
     start = time.time()
     iam = boto3.client("iam")
     role = iam.get_role(RoleName=iam_role)["Role"]["Arn"]
@@ -20,7 +37,7 @@ def deploy_image(image: str,
     print(f"config: {config}")
 
     # create HuggingFaceModel
-    llm_model = HuggingFaceModel(role=role, image_uri=image, env=config)
+    llm_model = HuggingFaceModel(role=role, image_uri=image, env=config, model_data=model_data)
 
     # deploy model to endpoint
     volume_size = None
@@ -40,12 +57,24 @@ def deploy_image(image: str,
             volume_size=volume_size,
             inference_ami_version = "al2-ami-sagemaker-inference-neuron-2"
         )
+        cold_start_time = round(time.time() - start)
         print(f"Successfully deployed {llm_model.name} as endpoint {llm_model.endpoint_name}")
+        print(f"Cold start time ({'pre-compiled' if model_data else 'compiled'} model): {cold_start_time}s")
     except Exception as e:
         print(e)
         print(f"Failed to deploy model with config {config} on {instance_type}")
+        return
     finally:
         print(f"Total time: {round(time.time() - start)}s")
+    if deployment_file is not None:
+        metadata = {"instance_type": instance_type, "copies": 1, "cold_start_time": cold_start_time}
+        if deployment_metadata is not None:
+            metadata.update(deployment_metadata)
+        try:
+            save_deployment(deployment_file, llm_model.endpoint_name, metadata)
+        except Exception as e:
+            print(e)
+            print(f"Endpoint {llm_model.endpoint_name} is deployed, but its metadata could not be recorded in {deployment_file}")
 
 
 # TGI deployment config
@@ -91,6 +120,14 @@ def get_neuronx_vllm_config(model_id, batch_size, sequence_length, auto_cast_typ
     return vllm_config
 
 
+def get_neuronx_config(image, model_id, batch_size, sequence_length, auto_cast_type, num_cores, token):
+    if "vllm" in image:
+        return get_neuronx_vllm_config(model_id, batch_size, sequence_length, auto_cast_type, num_cores, token)
+    if "tgi" in image:
+        return get_neuronx_tgi_config(model_id, batch_size, sequence_length, auto_cast_type, num_cores, token)
+    raise ValueError("You must pass a TGI or vLLM image")
+
+
 if __name__ == "__main__":
     # Query the current region
     session = boto3.session.Session()
@@ -121,6 +158,12 @@ if __name__ == "__main__":
     parser.add_argument(
         "--auto_cast_type", type=str, default="bf16", choices=["fp32", "fp16", "bf16"], help="One of fp32, fp16, bf16."
     )
+    parser.add_argument("--deployment_file",
+                        type=str,
+                        help="A JSON file where the endpoint deployment metadata will be recorded.")
+    parser.add_argument("--compiled_cache",
+                        type=str,
+                        help="An s3://<bucket>/<prefix> URI (or a local directory for testing) where to look up pre-compiled artifacts.")
     args = parser.parse_args()
 
     # Set region
@@ -135,24 +178,36 @@ if __name__ == "__main__":
                       "Please note also that your endpoint will be rate limited when fetching"
                       "from the Hugging Face hub and may not be able to start.")
 
-    if "vllm" in image:
-        config = get_neuronx_vllm_config(args.model_id,
-                                        args.batch_size,
-                                        args.sequence_length,
-                                        args.auto_cast_type,
-                                        args.num_cores,
-                                        args.token)
-    elif "tgi" in image:
-        config = get_neuronx_tgi_config(args.model_id,
-                                        args.batch_size,
-                                        args.sequence_length,
-                                        args.auto_cast_type,
-                                        args.num_cores,
-                                        args.token)
-    else:
-        raise ValueError("You must pass a TGI or vLLM image")
+    config = get_neuronx_config(image,
+                                args.model_id,
+                                args.batch_size,
+                                args.sequence_length,
+                                args.auto_cast_type,
+                                args.num_cores,
+                                args.token)
+
+    compile_params = get_compile_params(args.batch_size, args.sequence_length, args.num_cores, args.auto_cast_type)
+    deployment_metadata = dict(compile_params)
+    model_data = None
+    if args.compiled_cache is not None:
+        cache_key = get_cache_key(image, config, compile_params)
+        artifacts_uri = lookup_compiled_artifacts(args.compiled_cache, cache_key)
+        if artifacts_uri is None:
+            print(f"No pre-compiled artifacts found for key {cache_key}: the model will be compiled on the endpoint")
+        elif not artifacts_uri.startswith("s3://"):
+            warnings.warn(f"Pre-compiled artifacts found under {artifacts_uri}, but only artifacts stored on S3 "
+                          "can be deployed: the model will be compiled on the endpoint")
+            artifacts_uri = None
+        else:
+            print(f"Using pre-compiled artifacts from {artifacts_uri}")
+            config, model_data = use_compiled_artifacts(config, artifacts_uri)
+        deployment_metadata["cache_key"] = cache_key
+        deployment_metadata["compiled_cache_hit"] = artifacts_uri is not None
 
     deploy_image(image,
                  config,
                  instance_type=args.instance_type,
-                 iam_role=args.iam_role)
+                 iam_role=args.iam_role,
+                 deployment_file=args.deployment_file,
+                 deployment_metadata=deployment_metadata,
+                 model_data=model_data)
@@ -0,0 +1,217 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+from typing import Any, Dict, Optional
+
+import boto3
+
+# The directory where Sagemaker downloads the model data inside the container
+CONTAINER_MODEL_DIR = "/opt/ml/model"
+# Written last when storing artifacts, so that partially stored artifacts are never used
+CACHE_MARKER = "neuron_cache.json"
+# Secrets have no influence on the compiled artifacts and must never end up in the cache
+EXCLUDED_KEYS = ("HUGGING_FACE_HUB_TOKEN", "HF_TOKEN")
+# The compilation parameters, as found in the neuron section of an exported model config
+COMPILE_PARAMS = ("batch_size", "sequence_length", "num_cores", "auto_cast_type")
+
+
+def get_compile_params(batch_size: int, sequence_length: Optional[int], num_cores: int, auto_cast_type: str):
+    return {
+        "batch_size": batch_size,
+        "sequence_length": sequence_length,
+        "num_cores": num_cores,
+        "auto_cast_type": auto_cast_type,
+    }
+
+
+def get_cache_key(image: str, config: Dict[str, str], compile_params: Dict[str, Any]):
+    """Derive a deterministic cache key from the image tag, the deployment config and the compilation parameters
+
+    The compilation parameters are hashed explicitly, since not all of them appear in the deployment config
+    (the vLLM config does not specify the auto cast type).
+    The image registry is ignored, so that the same artifacts can be shared between regions.
+    """
+    image_tag = image.split("/")[-1]
+    cache_config = {k: v for k, v in config.items() if k not in EXCLUDED_KEYS}
+    key_source = json.dumps({
+        "image": image_tag,
+        "config": cache_config,
+        "compile_params": {k: compile_params[k] for k in COMPILE_PARAMS},
+    }, sort_keys=True)
+    return hashlib.sha256(key_source.encode("utf-8")).hexdigest()
+
+
+def _split_s3_uri(uri: str):
+    bucket, _, prefix = uri.removeprefix("s3://").partition("/")
+    return bucket, prefix.strip("/")
+
+
+def lookup_compiled_artifacts(cache_uri: str, key: str) -> Optional[str]:
+    """Look up pre-compiled artifacts in an S3 cache or in a local directory
+
+    Args:
+        cache_uri: an s3://<bucket>/<prefix> URI, or a local directory
+        key: the cache key
+    Returns:
+        The location of the artifacts if they are found, None otherwise
+    """
+    if cache_uri.startswith("s3://"):
+        bucket, prefix = _split_s3_uri(cache_uri)
+        artifacts_prefix = f"{prefix}/{key}" if prefix else key
+        s3 = boto3.client("s3")
+        response = s3.list_objects_v2(Bucket=bucket, Prefix=f"{artifacts_prefix}/{CACHE_MARKER}", MaxKeys=1)
+        if response.get("KeyCount", 0) == 0:
+            return None
+        return f"s3://{bucket}/{artifacts_prefix}/"
+    artifacts_dir = os.path.join(cache_uri, key)
+    if not os.path.exists(os.path.join(artifacts_dir, CACHE_MARKER)):
+        return None
+    return artifacts_dir
+
+
+def check_exported_model(model_dir: str, compile_params: Dict[str, Any]):
+    """Check that a directory contains a model exported for Neuron with the expected compilation parameters
+
+    Args:
+        model_dir: the local directory containing the exported model
+        compile_params: the batch_size, sequence_length, num_cores and auto_cast_type of the deployment
+    Raises:
+        ValueError: if the directory does not contain a matching model exported for Neuron
+    """
+    config_path = os.path.join(model_dir, "config.json")
+    if not os.path.isfile(config_path):
+        raise ValueError(f"{model_dir} does not contain a model config.json")
+    with open(config_path) as f:
+        neuron_config = json.load(f).get("neuron")
+    if not neuron_config:
+        raise ValueError(f"The model under {model_dir} has not been exported for Neuron")
+    for name in COMPILE_PARAMS:
+        expected = compile_params[name]
+        actual = neuron_config.get(name)
+        if str(actual) != str(expected):
+            raise ValueError(f"The model under {model_dir} was exported with {name}={actual}, "
+                             f"but the deployment requires {expected}")
+
+
+def store_compiled_artifacts(cache_uri: str,
+                             key: str,
+                             model_dir: str,
+                             image: str,
+                             config: Dict[str, str],
+                             compile_params: Dict[str, Any]):
+    """Store the artifacts of a model exported for Neuron in an S3 cache or in a local directory
+
+    Any artifacts previously stored under the same key are removed first.
+
+    Args:
+        cache_uri: an s3://<bucket>/<prefix> URI, or a local directory
+        key: the cache key
+        model_dir: the local directory containing the exported model
+        image: the image the artifacts were compiled for
+        config: the deployment config the artifacts were compiled for
+        compile_params: the batch_size, sequence_length, num_cores and auto_cast_type the artifacts were compiled for
+    Returns:
+        The location of the stored artifacts
+    Raises:
+        ValueError: if the sequence length is not specified, or if the exported model does not match
+    """
+    # Deployments without a sequence length would otherwise all share the first stored artifacts
+    if compile_params["sequence_length"] is None:
+        raise ValueError("The sequence length must be specified to store compiled artifacts")
+    check_exported_model(model_dir, compile_params)
+    marker = json.dumps({
+        "image": image.split("/")[-1],
+        "config": {k: v for k, v in config.items() if k not in EXCLUDED_KEYS},
+        "compile_params": {k: compile_params[k] for k in COMPILE_PARAMS},
+    }, indent=2, sort_keys=True)
+    if cache_uri.startswith("s3://"):
+        bucket, prefix = _split_s3_uri(cache_uri)
+        artifacts_prefix = f"{prefix}/{key}" if prefix else key
+        s3 = boto3.client("s3")
+        # Remove the marker first, so that previous artifacts are not used while they are removed
+        s3.delete_object(Bucket=bucket, Key=f"{artifacts_prefix}/{CACHE_MARKER}")
+        paginator = s3.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=bucket, Prefix=f"{artifacts_prefix}/"):
+            objects = [{"Key": obj["Key"]} for obj in page.get("Contents", [])]
+            if objects:
+                s3.delete_objects(Bucket=bucket, Delete={"Objects": objects})
+        for root, _, files in os.walk(model_dir):
+            for filename in files:
+                filepath = os.path.join(root, filename)
+                relpath = os.path.relpath(filepath, model_dir)
+                s3.upload_file(filepath, bucket, f"{artifacts_prefix}/{relpath}")
+        s3.put_object(Bucket=bucket, Key=f"{artifacts_prefix}/{CACHE_MARKER}", Body=marker.encode("utf-8"))
+        return f"s3://{bucket}/{artifacts_prefix}/"
+    artifacts_dir = os.path.join(cache_uri, key)
+    marker_path = os.path.join(artifacts_dir, CACHE_MARKER)
+    # Remove the marker first, so that previous artifacts are not used while they are removed
+    if os.path.exists(marker_path):
+        os.remove(marker_path)
+    shutil.rmtree(artifacts_dir, ignore_errors=True)
+    shutil.copytree(model_dir, artifacts_dir)
+    with open(marker_path, "w") as f:
+        f.write(marker)
+    return artifacts_dir
+
+
+def use_compiled_artifacts(config: Dict[str, str], artifacts_uri: str):
+    """Point the container to the pre-compiled artifacts
+
+    Args:
+        config: the TGI or vLLM deployment config
+        artifacts_uri: the S3 location of the artifacts
+    Returns:
+        A tuple of the updated config and the Sagemaker model data to download in the container
+    """
+    config = dict(config)
+    if "SM_VLLM_MODEL" in config:
+        config["SM_VLLM_MODEL"] = CONTAINER_MODEL_DIR
+    else:
+        config["MODEL_ID"] = CONTAINER_MODEL_DIR
+    model_data = {
+        "S3DataSource": {
+            "S3Uri": artifacts_uri,
+            "S3DataType": "S3Prefix",
+            "CompressionType": "None",
+        }
+    }
+    return config, model_data
+
+
+if __name__ == "__main__":
+    # Importing here avoids a circular import, since deploy_image uses this module
+    from deploy_image import get_neuronx_config
+
+    parser = argparse.ArgumentParser(description="Store a model exported for Neuron in the compiled artifacts cache")
+    parser.add_argument("model_dir", type=str, help="The local directory containing the exported model")
+    parser.add_argument("--compiled_cache", type=str, required=True, help="An s3://<bucket>/<prefix> URI or a local directory")
+    parser.add_argument("--image", type=str, required=True, help="The full Sagemaker image URI")
+    parser.add_argument("--model_id", type=str, required=True, help="The HuggingFace model id")
+    parser.add_argument("--batch_size", type=int, default=1, help="The batch size.")
+    parser.add_argument("--sequence_length", type=int, required=True, help="The maximum sequence length.")
+    parser.add_argument(
+        "--num_cores", type=int, default=2, help="The number of cores on which the model should be split."
+    )
+    parser.add_argument(
+        "--auto_cast_type", type=str, default="bf16", choices=["fp32", "fp16", "bf16"], help="One of fp32, fp16, bf16."
+    )
+    args = parser.parse_args()
+
+    config = get_neuronx_config(args.image,
+                                args.model_id,
+                                args.batch_size,
+                                args.sequence_length,
+                                args.auto_cast_type,
+                                args.num_cores,
+                                token=None)
+    compile_params = get_compile_params(args.batch_size, args.sequence_length, args.num_cores, args.auto_cast_type)
+    key = get_cache_key(args.image, config, compile_params)
+    artifacts_uri = store_compiled_artifacts(args.compiled_cache,
+                                             key,
+                                             args.model_dir,
+                                             args.image,
+                                             config,
+                                             compile_params)
+    print(f"Stored compiled artifacts for {config} as {artifacts_uri}")